@@ -5,15 +5,33 @@ Sweat Drops Generator Extension for Inkscape
 
 import sys
 import os
-import random
 import math
+import itertools
 
 try:
     import inkex
 except ImportError as e:
     sys.exit(1)
 
-from inkex import Circle, Ellipse, Group
+from inkex import Group
+from lxml import etree
+import numpy as np
+
+_SVG_G = inkex.addNS('g', 'svg')
+_SVG_ELLIPSE = inkex.addNS('ellipse', 'svg')
+_SVG_LINEAR_GRADIENT = inkex.addNS('linearGradient', 'svg')
+_SVG_RADIAL_GRADIENT = inkex.addNS('radialGradient', 'svg')
+_SVG_STOP = inkex.addNS('stop', 'svg')
+_INKSCAPE_LABEL = inkex.addNS('label', 'inkscape')
+
+_gradient_ids = itertools.count(1)
+
+# Gradient stop styles; only the first shadow stop depends on the options
+_SHADOW_STOP1_STYLE = "stop-color:#000000;stop-opacity:%s"
+_SHADOW_STOP2_STYLE = "stop-color:#000000;stop-opacity:0.0"
+_DROP_STOP1_STYLE = "stop-color:#ffffff;stop-opacity:0.0"
+_DROP_STOP2_STYLE = "stop-color:#121212;stop-opacity:0.014"
+_DROP_STOP3_STYLE = "stop-color:#ffffff;stop-opacity:0.286"
 
 class SweatDropsExtension(inkex.EffectExtension):
     """Extension to automatically generate sweat drops"""
@@ -45,172 +63,162 @@ class SweatDropsExtension(inkex.EffectExtension):
     def effect(self):
         """Main processing method"""
         try:
-            count = self.options.drop_count
-            base_size = self.options.drop_size
-            size_var = self.options.size_variation
+            opts = self.options
+            count = opts.drop_count
+            base_size = opts.drop_size
+            size_var = opts.size_variation
+            
+            # Per-run constants, looked up once instead of once per drop
+            self._highlight_size = opts.highlight_size
+            
+            shadow_angle = math.radians(opts.shadow_angle)
+            self._shadow_dx = math.cos(shadow_angle) * opts.shadow_distance
+            self._shadow_dy = math.sin(shadow_angle) * opts.shadow_distance
+            highlight_angle = math.radians(opts.highlight_angle)
+            self._highlight_ux = math.cos(highlight_angle)
+            self._highlight_uy = math.sin(highlight_angle)
             
             current_layer = self.svg.get_current_layer()
             
             main_group = Group()
             main_group.label = "Sweat Drops"
             
-            for i in range(count):
-                drop_group = self.create_single_drop(i, base_size, size_var)
-                main_group.add(drop_group)
+            # Gradients are identical for every drop, so share one copy of each
+            shadow_gradient = self.create_shadow_gradient()
+            drop_gradient = self.create_drop_gradient()
+            self.svg.defs.extend((shadow_gradient, drop_gradient))
+            self._shadow_grad_id = shadow_gradient.get('id')
+            self._drop_grad_id = drop_gradient.get('id')
+            
+            # Every drop shares the same styles, so serialize them once
+            blend_mode = opts.blend_mode
+            self._shadow_style = "fill:url(#%s);stroke:none;mix-blend-mode:%s" % (
+                self._shadow_grad_id, blend_mode)
+            self._drop_style = "fill:url(#%s);stroke:none;mix-blend-mode:%s;opacity:1" % (
+                self._drop_grad_id, blend_mode)
+            self._highlight_style = "fill:#ffffff;fill-opacity:%s;stroke:none;mix-blend-mode:%s" % (
+                opts.highlight_opacity, blend_mode)
+            
+            # Sample every drop's size and position in one go
+            rng = np.random.default_rng()
+            sizes = (rng.uniform(1.0 - size_var, 1.0 + size_var, count) * base_size).tolist()
+            xs = rng.uniform(0, opts.area_width, count).tolist()
+            ys = rng.uniform(0, opts.area_height, count).tolist()
+            
+            # Build all drops detached, then attach them in one batch
+            main_group.extend([
+                self.create_single_drop(i, xs[i], ys[i], sizes[i])
+                for i in range(count)
+            ])
             
             current_layer.add(main_group)
             
         except Exception as e:
             pass
     
-    def create_single_drop(self, index, base_size, size_variation):
+    def create_single_drop(self, index, x, y, drop_size):
         """Create a single sweat drop"""
-        # Determine size
-        size_factor = 1.0 + random.uniform(-size_variation, size_variation)
-        drop_size = base_size * size_factor
-        
-        # Determine position
-        x = random.uniform(0, self.options.area_width)
-        y = random.uniform(0, self.options.area_height)
-        
         # Create drop group
-        drop_group = Group()
-        drop_group.label = f"Drop_{index + 1}"
+        drop_group = etree.Element(_SVG_G, {_INKSCAPE_LABEL: f"Drop_{index + 1}"})
         
         # Create shadow
-        shadow = self.create_shadow(x, y, drop_size)
-        drop_group.add(shadow)
+        self.create_shadow(drop_group, x, y, drop_size)
         
         # Create main drop
-        main_drop = self.create_main_drop(x, y, drop_size)
-        drop_group.add(main_drop)
+        self.create_main_drop(drop_group, x, y, drop_size)
         
         # Create highlight
-        highlight = self.create_highlight(x, y, drop_size)
-        drop_group.add(highlight)
+        self.create_highlight(drop_group, x, y, drop_size)
         
         return drop_group
     
-    def create_shadow(self, x, y, size):
+    def create_shadow(self, parent, x, y, size):
         """Create shadow using linear gradient"""
-        angle_rad = math.radians(self.options.shadow_angle)
-        shadow_x = x + math.cos(angle_rad) * self.options.shadow_distance
-        shadow_y = y + math.sin(angle_rad) * self.options.shadow_distance
-        
-        shadow = Ellipse()
-        shadow.set('cx', str(shadow_x))
-        shadow.set('cy', str(shadow_y))
-        shadow.set('rx', str(size * 0.6))
-        shadow.set('ry', str(size * 0.8))
-        
-        shadow_gradient_id = self.create_shadow_gradient()
-        
-        shadow.style = {
-            'fill': f'url(#{shadow_gradient_id})',
-            'stroke': 'none',
-            'mix-blend-mode': self.options.blend_mode
-        }
-        
-        return shadow
+        shadow_x = x + self._shadow_dx
+        shadow_y = y + self._shadow_dy
+        
+        return etree.SubElement(parent, _SVG_ELLIPSE, {
+            'cx': format(shadow_x, 'g'),
+            'cy': format(shadow_y, 'g'),
+            'rx': format(size * 0.6, 'g'),
+            'ry': format(size * 0.8, 'g'),
+            'style': self._shadow_style,
+        })
     
-    def create_main_drop(self, x, y, size):
+    def create_main_drop(self, parent, x, y, size):
         """Create main drop body (skin tone compatible)"""
-        drop = Ellipse()
-        drop.set('cx', str(x))
-        drop.set('cy', str(y))
-        drop.set('rx', str(size * 0.6))
-        drop.set('ry', str(size * 0.8))
-        
-        gradient_id = self.create_drop_gradient()
-        
-        drop.style = {
-            'fill': f'url(#{gradient_id})',
-            'stroke': 'none',
-            'mix-blend-mode': self.options.blend_mode,
-            'opacity': '1'
-        }
-        
-        return drop
+        return etree.SubElement(parent, _SVG_ELLIPSE, {
+            'cx': format(x, 'g'),
+            'cy': format(y, 'g'),
+            'rx': format(size * 0.6, 'g'),
+            'ry': format(size * 0.8, 'g'),
+            'style': self._drop_style,
+        })
     
-    def create_highlight(self, x, y, size):
+    def create_highlight(self, parent, x, y, size):
         """Create highlight (skin tone compatible)"""
         # Calculate highlight p
-        angle_rad = math.radians(self.options.highlight_angle)
         highlight_offset = size * 0.3
-        highlight_x = x + math.cos(angle_rad) * highlight_offset
-        highlight_y = y + math.sin(angle_rad) * highlight_offset
-        
-        highlight = Ellipse()
-        highlight_size = size * self.options.highlight_size
-        highlight.set('cx', str(highlight_x))
-        highlight.set('cy', str(highlight_y))
-        highlight.set('rx', str(highlight_size * 0.4))
-        highlight.set('ry', str(highlight_size * 0.6))
-        
-        highlight.style = {
-            'fill': '#ffffff',
-            'fill-opacity': str(self.options.highlight_opacity),
-            'stroke': 'none',
-            'mix-blend-mode': self.options.blend_mode
-        }
-        
-        return highlight
+        highlight_x = x + self._highlight_ux * highlight_offset
+        highlight_y = y + self._highlight_uy * highlight_offset
+        
+        highlight_size = size * self._highlight_size
+        return etree.SubElement(parent, _SVG_ELLIPSE, {
+            'cx': format(highlight_x, 'g'),
+            'cy': format(highlight_y, 'g'),
+            'rx': format(highlight_size * 0.4, 'g'),
+            'ry': format(highlight_size * 0.6, 'g'),
+            'style': self._highlight_style,
+        })
+    
+    def new_gradient_id(self, prefix):
+        """Return the next counter-based gradient ID not already in the document"""
+        while True:
+            gradient_id = f"{prefix}{next(_gradient_ids)}"
+            if self.svg.getElementById(gradient_id) is None:
+                return gradient_id
     
     def create_shadow_gradient(self):
         """Create linear gradient for shadow"""
         # Generate gradient ID
-        gradient_id = f"shadowGradient_{random.randint(1000, 9999)}"
-        
-        gradient = inkex.LinearGradient()
-        gradient.set('id', gradient_id)
-        
-        stop1 = inkex.Stop()
-        stop1.set('offset', '0%')
-        stop1.style = {'stop-color': '#000000', 'stop-opacity': str(self.options.shadow_opacity)}
-        
-        stop2 = inkex.Stop()
-        stop2.set('offset', '100%')
-        stop2.style = {'stop-color': '#000000', 'stop-opacity': '0.0'}
-        
-        gradient.add(stop1)
-        gradient.add(stop2)
-        
-        defs = self.svg.defs
-        defs.add(gradient)
-        
-        return gradient_id
+        gradient_id = self.new_gradient_id("shadowGradient_")
+        
+        gradient = etree.Element(_SVG_LINEAR_GRADIENT, {'id': gradient_id})
+        etree.SubElement(gradient, _SVG_STOP, {
+            'offset': '0%',
+            'style': _SHADOW_STOP1_STYLE % self.options.shadow_opacity,
+        })
+        etree.SubElement(gradient, _SVG_STOP, {
+            'offset': '100%',
+            'style': _SHADOW_STOP2_STYLE,
+        })
+        
+        return gradient
 
     def create_drop_gradient(self):
         """Create gradient for drop (adjusted to match SVG colors)"""
-        gradient_id = f"dropGradient_{random.randint(1000, 9999)}"
-        
-        gradient = inkex.RadialGradient()
-        gradient.set('id', gradient_id)
-        gradient.set('cx', '0.3')
-        gradient.set('cy', '0.3')
-        gradient.set('r', '0.7')
-        
-        stop1 = inkex.Stop()
-        stop1.set('offset', '0%')
-        stop1.style = {'stop-color': '#ffffff', 'stop-opacity': '0.0'}
-        
-        stop2 = inkex.Stop()
-        stop2.set('offset', '37%')
-        stop2.style = {'stop-color': '#121212', 'stop-opacity': '0.014'}
-        
-        stop3 = inkex.Stop()
-        stop3.set('offset', '100%')
-        stop3.style = {'stop-color': '#ffffff', 'stop-opacity': '0.286'}
-        
-        gradient.add(stop1)
-        gradient.add(stop2)
-        gradient.add(stop3)
-        
-        # Add to defs
-        defs = self.svg.defs
-        defs.add(gradient)
-        
-        return gradient_id
+        gradient_id = self.new_gradient_id("dropGradient_")
+        
+        gradient = etree.Element(_SVG_RADIAL_GRADIENT, {
+            'id': gradient_id,
+            'cx': '0.3',
+            'cy': '0.3',
+            'r': '0.7',
+        })
+        etree.SubElement(gradient, _SVG_STOP, {
+            'offset': '0%',
+            'style': _DROP_STOP1_STYLE,
+        })
+        etree.SubElement(gradient, _SVG_STOP, {
+            'offset': '37%',
+            'style': _DROP_STOP2_STYLE,
+        })
+        etree.SubElement(gradient, _SVG_STOP, {
+            'offset': '100%',
+            'style': _DROP_STOP3_STYLE,
+        })
+        
+        return gradient
     
 if __name__ == '__main__':
     try:
@@ -5,15 +5,94 @@ Teardrop Sweat Drops Generator Extension for Inkscape
 
 import sys
 import os
-import random
 import math
+import itertools
 
 try:
     import inkex
 except ImportError as e:
     sys.exit(1)
 
-from inkex import Group, PathElement
+from inkex import Group
+from lxml import etree
+import numpy as np
+
+_SVG_G = inkex.addNS('g', 'svg')
+_SVG_PATH = inkex.addNS('path', 'svg')
+_SVG_LINEAR_GRADIENT = inkex.addNS('linearGradient', 'svg')
+_SVG_RADIAL_GRADIENT = inkex.addNS('radialGradient', 'svg')
+_SVG_STOP = inkex.addNS('stop', 'svg')
+_INKSCAPE_LABEL = inkex.addNS('label', 'inkscape')
+
+_gradient_ids = itertools.count(1)
+
+# Gradient stop styles; only the first shadow stop depends on the options
+_SHADOW_STOP1_STYLE = "stop-color:#000000;stop-opacity:%s"
+_SHADOW_STOP2_STYLE = "stop-color:#000000;stop-opacity:0.0"
+_DROP_STOP1_STYLE = "stop-color:#ffffff;stop-opacity:0.0"
+_DROP_STOP2_STYLE = "stop-color:#121212;stop-opacity:0.014"
+_DROP_STOP3_STYLE = "stop-color:#ffffff;stop-opacity:0.286"
+
+# Teardrop outline: start at the bottom tip, up the left side to the top
+# point, down the right side and back
+_TEARDROP_PATH = (
+    "M %g,%g "
+    "C %g,%g %g,%g %g,%g "
+    "C %g,%g %g,%g %g,%g "
+    "C %g,%g %g,%g %g,%g "
+    "C %g,%g %g,%g %g,%g Z"
+)
+
+def _teardrop_coords(xs, ys, sizes, ratio, out):
+    """Fill row i of out with the 26 numbers of _TEARDROP_PATH for teardrop i"""
+    # Basic shape parameters
+    width = sizes * 0.6
+    height = sizes * ratio
+    
+    # Calculate control points
+    bottom_y = ys + height * 0.3
+    top_y = ys - height * 0.7
+    
+    # Bezier curve control points
+    cx1 = xs - width * 0.5
+    cx2 = xs + width * 0.5
+    shoulder_y = ys - height * 0.2
+    neck_y = top_y + height * 0.3
+    top_ctrl_y = top_y + height * 0.1
+    w02 = width * 0.2
+    
+    # Start point, then the four cubic segments
+    out[:, 0] = xs
+    out[:, 1] = bottom_y
+    
+    out[:, 2] = cx1
+    out[:, 3] = bottom_y
+    out[:, 4] = cx1
+    out[:, 5] = ys
+    out[:, 6] = cx1
+    out[:, 7] = shoulder_y
+    
+    out[:, 8] = cx1
+    out[:, 9] = neck_y
+    out[:, 10] = xs - w02
+    out[:, 11] = top_ctrl_y
+    out[:, 12] = xs
+    out[:, 13] = top_y
+    
+    out[:, 14] = xs + w02
+    out[:, 15] = top_ctrl_y
+    out[:, 16] = cx2
+    out[:, 17] = neck_y
+    out[:, 18] = cx2
+    out[:, 19] = shoulder_y
+    
+    out[:, 20] = cx2
+    out[:, 21] = ys
+    out[:, 22] = cx2
+    out[:, 23] = bottom_y
+    out[:, 24] = xs
+    out[:, 25] = bottom_y
+    return out
 
 class TeardropSweatDropsExtension(inkex.EffectExtension):
     """Extension to automatically generate teardrop-shaped sweat drops"""
@@ -48,210 +127,186 @@ class TeardropSweatDropsExtension(inkex.EffectExtension):
     def effect(self):
         """Main processing method"""
         try:
-            count = self.options.drop_count
-            base_size = self.options.drop_size
-            size_var = self.options.size_variation
+            opts = self.options
+            count = opts.drop_count
+            base_size = opts.drop_size
+            size_var = opts.size_variation
+            
+            # Per-run constants, looked up once instead of once per drop
+            self._teardrop_ratio = opts.teardrop_ratio
+            
+            shadow_angle = math.radians(opts.shadow_angle)
+            self._shadow_dx = math.cos(shadow_angle) * opts.shadow_distance
+            self._shadow_dy = math.sin(shadow_angle) * opts.shadow_distance
+            highlight_angle = math.radians(opts.highlight_angle)
+            self._highlight_ux = math.cos(highlight_angle)
+            self._highlight_uy = math.sin(highlight_angle)
             
             current_layer = self.svg.get_current_layer()
             
             main_group = Group()
             main_group.label = "Teardrop Sweat Drops"
             
-            for i in range(count):
-                drop_group = self.create_single_teardrop(i, base_size, size_var)
-                main_group.add(drop_group)
+            # Gradients are identical for every drop, so share one copy of each
+            shadow_gradient = self.create_shadow_gradient()
+            drop_gradient = self.create_drop_gradient()
+            self.svg.defs.extend((shadow_gradient, drop_gradient))
+            self._shadow_grad_id = shadow_gradient.get('id')
+            self._drop_grad_id = drop_gradient.get('id')
+            
+            # Every drop shares the same styles, so serialize them once
+            blend_mode = opts.blend_mode
+            self._shadow_style = "fill:url(#%s);stroke:none;mix-blend-mode:%s" % (
+                self._shadow_grad_id, blend_mode)
+            self._drop_style = "fill:url(#%s);stroke:none;mix-blend-mode:%s;opacity:1" % (
+                self._drop_grad_id, blend_mode)
+            self._highlight_style = "fill:#ffffff;fill-opacity:%s;stroke:none;mix-blend-mode:%s" % (
+                opts.highlight_opacity, blend_mode)
+            
+            # Sample every drop's size and position in one go
+            rng = np.random.default_rng()
+            sizes = rng.uniform(1.0 - size_var, 1.0 + size_var, count) * base_size
+            xs = rng.uniform(0, opts.area_width, count)
+            ys = rng.uniform(0, opts.area_height, count)
+            rotations = rng.uniform(-opts.rotation_variation, opts.rotation_variation, count)
+            
+            # Near-zero tilts aren't visible, so skip their transform entirely
+            rotations[np.abs(rotations) <= 0.01] = 0.0
+            
+            # Each drop is rotated as one group about its centre. Place the
+            # shadow and highlight in the group's unrotated frame so that they
+            # still land at the light-angle offsets once the rotation applies.
+            rotation_rad = np.radians(rotations)
+            cos_r = np.cos(rotation_rad)
+            sin_r = np.sin(rotation_rad)
+            shadow_xs = xs + self._shadow_dx * cos_r + self._shadow_dy * sin_r
+            shadow_ys = ys - self._shadow_dx * sin_r + self._shadow_dy * cos_r
+            
+            # Highlight position is adjusted for the teardrop shape
+            highlight_offsets = sizes * 0.2
+            highlight_xs = xs + (self._highlight_ux * cos_r + self._highlight_uy * sin_r) * highlight_offsets
+            highlight_ys = ys + (self._highlight_uy * cos_r - self._highlight_ux * sin_r) * highlight_offsets
+            
+            # Path data for each layer of every drop, one array pass per layer
+            shadow_paths = self.create_teardrop_paths(shadow_xs, shadow_ys, sizes)
+            main_paths = self.create_teardrop_paths(xs, ys, sizes)
+            highlight_paths = self.create_teardrop_paths(
+                highlight_xs, highlight_ys, sizes * opts.highlight_size)
+            
+            drops = zip(xs.tolist(), ys.tolist(), rotations.tolist(),
+                        shadow_paths, main_paths, highlight_paths)
+            
+            # Build all drops detached, then attach them in one batch
+            main_group.extend([
+                self.create_single_teardrop(i, *drop)
+                for i, drop in enumerate(drops)
+            ])
             
             current_layer.add(main_group)
             
         except Exception as e:
             pass
     
-    def create_single_teardrop(self, index, base_size, size_variation):
-        """Create a single teardrop"""
-        # Determine size
-        size_factor = 1.0 + random.uniform(-size_variation, size_variation)
-        drop_size = base_size * size_factor
-        
-        # Determine position
-        x = random.uniform(0, self.options.area_width)
-        y = random.uniform(0, self.options.area_height)
-        
-        # Determine rotation angle
-        rotation = random.uniform(-self.options.rotation_variation, self.options.rotation_variation)
-        
-        # Create teardrop group
-        drop_group = Group()
-        drop_group.label = f"Teardrop_{index + 1}"
+    def create_single_teardrop(self, index, x, y, rotation, shadow_path, main_path, highlight_path):
+        """Create a single teardrop from the path data of its three layers"""
+        # Create teardrop group, rotated as a whole about the drop centre
+        attrib = {_INKSCAPE_LABEL: f"Teardrop_{index + 1}"}
+        if rotation:
+            attrib['transform'] = "rotate(%g,%g,%g)" % (rotation, x, y)
+        drop_group = etree.Element(_SVG_G, attrib)
         
         # Create shadow
-        shadow = self.create_teardrop_shadow(x, y, drop_size, rotation)
-        drop_group.add(shadow)
+        self.create_teardrop_shadow(drop_group, shadow_path)
         
         # Create main teardrop
-        main_drop = self.create_teardrop_main(x, y, drop_size, rotation)
-        drop_group.add(main_drop)
+        self.create_teardrop_main(drop_group, main_path)
         
         # Create highlight
-        highlight = self.create_teardrop_highlight(x, y, drop_size, rotation)
-        drop_group.add(highlight)
+        self.create_teardrop_highlight(drop_group, highlight_path)
         
         return drop_group
     
-    def create_teardrop_path(self, x, y, size, rotation=0):
-        """Create teardrop-shaped path"""
-        # Basic shape parameters
-        width = size * 0.6
-        height = size * self.options.teardrop_ratio
-        
-        # Calculate control points
-        bottom_y = y + height * 0.3
-        top_y = y - height * 0.7
-        
-        # Bezier curve control points
-        cx1 = x - width * 0.5
-        cx2 = x + width * 0.5
-        cy_mid = y
-        
-        # Build path data (SVG d attribute)
-        path_data = f"""
-        M {x},{bottom_y}
-        C {cx1},{bottom_y} {cx1},{cy_mid} {cx1},{cy_mid - height * 0.2}
-        C {cx1},{top_y + height * 0.3} {x - width * 0.2},{top_y + height * 0.1} {x},{top_y}
-        C {x + width * 0.2},{top_y + height * 0.1} {cx2},{top_y + height * 0.3} {cx2},{cy_mid - height * 0.2}
-        C {cx2},{cy_mid} {cx2},{bottom_y} {x},{bottom_y}
-        Z
-        """
-        
-        # Clean up path data
-        path_data = " ".join(path_data.split())
-        
-        return path_data
+    def create_teardrop_paths(self, xs, ys, sizes):
+        """Create teardrop-shaped path data for every drop at once"""
+        coords = _teardrop_coords(xs, ys, sizes, self._teardrop_ratio, np.empty((len(xs), 26)))
+        # zip() over the columns yields each row as a tuple, ready for %
+        return [_TEARDROP_PATH % row for row in zip(*coords.T.tolist())]
     
-    def create_teardrop_shadow(self, x, y, size, rotation):
+    def create_teardrop_shadow(self, parent, path_data):
         """Create teardrop shadow"""
-        angle_rad = math.radians(self.options.shadow_angle)
-        shadow_x = x + math.cos(angle_rad) * self.options.shadow_distance
-        shadow_y = y + math.sin(angle_rad) * self.options.shadow_distance
-        
-        path_data = self.create_teardrop_path(shadow_x, shadow_y, size, rotation)
-        
-        shadow_path = PathElement()
-        shadow_path.set('d', path_data)
-        
-        shadow_gradient_id = self.create_shadow_gradient()
-        
-        shadow_path.style = {
-            'fill': f'url(#{shadow_gradient_id})',
-            'stroke': 'none',
-            'mix-blend-mode': self.options.blend_mode
-        }
-        
-        if rotation != 0:
-            shadow_path.transform = inkex.Transform(rotate=(rotation, shadow_x, shadow_y))
+        shadow_path = etree.SubElement(parent, _SVG_PATH, {
+            'd': path_data,
+            'style': self._shadow_style,
+        })
         
         return shadow_path
     
-    def create_teardrop_main(self, x, y, size, rotation):
+    def create_teardrop_main(self, parent, path_data):
         """Create main teardrop body"""
-        path_data = self.create_teardrop_path(x, y, size, rotation)
-        
-        main_path = PathElement()
-        main_path.set('d', path_data)
-        
-        gradient_id = self.create_drop_gradient()
-        
-        main_path.style = {
-            'fill': f'url(#{gradient_id})',
-            'stroke': 'none',
-            'mix-blend-mode': self.options.blend_mode,
-            'opacity': '1'
-        }
-        
-        if rotation != 0:
-            main_path.transform = inkex.Transform(rotate=(rotation, x, y))
+        main_path = etree.SubElement(parent, _SVG_PATH, {
+            'd': path_data,
+            'style': self._drop_style,
+        })
         
         return main_path
     
-    def create_teardrop_highlight(self, x, y, size, rotation):
+    def create_teardrop_highlight(self, parent, path_data):
         """Create teardrop highlight"""
-        # Calculate highlight position (adjusted for teardrop shape)
-        angle_rad = math.radians(self.options.highlight_angle)
-        highlight_offset = size * 0.2
-        highlight_x = x + math.cos(angle_rad) * highlight_offset
-        highlight_y = y + math.sin(angle_rad) * highlight_offset
-        
-        highlight_size = size * self.options.highlight_size
-        path_data = self.create_teardrop_path(highlight_x, highlight_y, highlight_size, rotation)
-        
-        highlight_path = PathElement()
-        highlight_path.set('d', path_data)
-        
-        highlight_path.style = {
-            'fill': '#ffffff',
-            'fill-opacity': str(self.options.highlight_opacity),
-            'stroke': 'none',
-            'mix-blend-mode': self.options.blend_mode
-        }
-        
-        if rotation != 0:
-            highlight_path.transform = inkex.Transform(rotate=(rotation, highlight_x, highlight_y))
+        highlight_path = etree.SubElement(parent, _SVG_PATH, {
+            'd': path_data,
+            'style': self._highlight_style,
+        })
         
         return highlight_path
     
+    def new_gradient_id(self, prefix):
+        """Return the next counter-based gradient ID not already in the document"""
+        while True:
+            gradient_id = f"{prefix}{next(_gradient_ids)}"
+            if self.svg.getElementById(gradient_id) is None:
+                return gradient_id
+    
     def create_shadow_gradient(self):
         """Create linear gradient for shadow"""
-        gradient_id = f"shadowGradient_{random.randint(1000, 9999)}"
-        
-        gradient = inkex.LinearGradient()
-        gradient.set('id', gradient_id)
-        
-        stop1 = inkex.Stop()
-        stop1.set('offset', '0%')
-        stop1.style = {'stop-color': '#000000', 'stop-opacity': str(self.options.shadow_opacity)}
-        
-        stop2 = inkex.Stop()
-        stop2.set('offset', '100%')
-        stop2.style = {'stop-color': '#000000', 'stop-opacity': '0.0'}
-        
-        gradient.add(stop1)
-        gradient.add(stop2)
-        
-        defs = self.svg.defs
-        defs.add(gradient)
-        
-        return gradient_id
+        gradient_id = self.new_gradient_id("shadowGradient_")
+        
+        gradient = etree.Element(_SVG_LINEAR_GRADIENT, {'id': gradient_id})
+        etree.SubElement(gradient, _SVG_STOP, {
+            'offset': '0%',
+            'style': _SHADOW_STOP1_STYLE % self.options.shadow_opacity,
+        })
+        etree.SubElement(gradient, _SVG_STOP, {
+            'offset': '100%',
+            'style': _SHADOW_STOP2_STYLE,
+        })
+        
+        return gradient
     
     def create_drop_gradient(self):
         """Create gradient for teardrop"""
         # Generate gradient ID
-        gradient_id = f"dropGradient_{random.randint(1000, 9999)}"
-        
-        gradient = inkex.RadialGradient()
-        gradient.set('id', gradient_id)
-        gradient.set('cx', '0.3')
-        gradient.set('cy', '0.3')
-        gradient.set('r', '0.7')
-        
-        stop1 = inkex.Stop()
-        stop1.set('offset', '0%')
-        stop1.style = {'stop-color': '#ffffff', 'stop-opacity': '0.0'}
-        
-        stop2 = inkex.Stop()
-        stop2.set('offset', '37%')
-        stop2.style = {'stop-color': '#121212', 'stop-opacity': '0.014'}
-        
-        stop3 = inkex.Stop()
-        stop3.set('offset', '100%')
-        stop3.style = {'stop-color': '#ffffff', 'stop-opacity': '0.286'}
-        
-        gradient.add(stop1)
-        gradient.add(stop2)
-        gradient.add(stop3)
-        
-        defs = self.svg.defs
-        defs.add(gradient)
-        
-        return gradient_id
+        gradient_id = self.new_gradient_id("dropGradient_")
+        
+        gradient = etree.Element(_SVG_RADIAL_GRADIENT, {
+            'id': gradient_id,
+            'cx': '0.3',
+            'cy': '0.3',
+            'r': '0.7',
+        })
+        etree.SubElement(gradient, _SVG_STOP, {
+            'offset': '0%',
+            'style': _DROP_STOP1_STYLE,
+        })
+        etree.SubElement(gradient, _SVG_STOP, {
+            'offset': '37%',
+            'style': _DROP_STOP2_STYLE,
+        })
+        etree.SubElement(gradient, _SVG_STOP, {
+            'offset': '100%',
+            'style': _DROP_STOP3_STYLE,
+        })
+        
+        return gradient
 
 if __name__ == '__main__':
     try: